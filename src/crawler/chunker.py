@@ -7,6 +7,10 @@ import xxhash
 from ..shared.config import settings
 from ..shared.models import DocumentChunk, DocumentMetadata
 
+# Separator excludes newlines so a bare "#" line can't pair with the next line
+_HEADING_RE = re.compile(r"^(#{1,6})[^\S\n]+(.+)$", re.MULTILINE)
+_PARA_SPLIT_RE = re.compile(r"\n{2,}")
+
 
 class DocumentChunker:
     """Split documents into semantic chunks for vector storage."""
@@ -18,7 +22,6 @@ class DocumentChunker:
     ):
         self.max_chunk_tokens = max_chunk_tokens
         self.overlap_tokens = overlap_tokens
-        self.heading_pattern = re.compile(r"^(#{1,6})\s+(.+)$", re.MULTILINE)
 
     def chunk(self, content: str, metadata: DocumentMetadata) -> list[DocumentChunk]:
         """Split markdown content into chunks.
@@ -28,7 +31,7 @@ class DocumentChunker:
         2. If section > max_tokens, split on paragraphs
         3. Preserve heading context for each chunk
         """
-        document_id = xxhash.xxh64(metadata.url.encode()).hexdigest()
+        document_id = self.document_id(metadata.url)
         sections = self._split_by_headings(content)
 
         chunks = []
@@ -55,63 +58,65 @@ class DocumentChunker:
 
         return chunks
 
+    def document_id(self, url: str) -> str:
+        """Return the stable document ID for a URL (prefix of its chunk IDs)."""
+        return xxhash.xxh64_hexdigest(url.encode())
+
     def _split_by_headings(self, content: str) -> list[tuple[list[str], str]]:
         """Split content by heading hierarchy.
 
         Returns list of (heading_path, section_text) tuples.
         """
-        lines = content.split("\n")
         sections: list[tuple[list[str], str]] = []
         current_headings: list[str] = []
-        current_section: list[str] = []
-
-        for line in lines:
-            heading_match = self.heading_pattern.match(line)
+        section_start = 0
 
-            if heading_match:
-                # Save previous section if it has content
-                if current_section:
-                    section_text = "\n".join(current_section).strip()
-                    if section_text:
-                        sections.append((list(current_headings), section_text))
-                    current_section = []
+        for heading_match in _HEADING_RE.finditer(content):
+            # Save previous section if it has content
+            section_text = content[section_start : heading_match.start()].strip()
+            if section_text:
+                sections.append((list(current_headings), section_text))
 
-                # Update heading context
-                level = len(heading_match.group(1))  # Number of #
-                heading_text = heading_match.group(2).strip()
+            # Update heading context
+            level = heading_match.end(1) - heading_match.start(1)  # Number of #
+            heading_text = heading_match.group(2).strip()
 
-                # Trim headings to current level
-                current_headings = current_headings[: level - 1]
-                current_headings.append(heading_text)
+            # Trim headings to current level
+            current_headings = current_headings[: level - 1]
+            current_headings.append(heading_text)
 
-                # Include heading in section
-                current_section.append(line)
-            else:
-                current_section.append(line)
+            # Include heading in section
+            section_start = heading_match.start()
 
         # Don't forget the last section
-        if current_section:
-            section_text = "\n".join(current_section).strip()
-            if section_text:
-                sections.append((list(current_headings), section_text))
+        section_text = content[section_start:].strip()
+        if section_text:
+            sections.append((list(current_headings), section_text))
 
         return sections
 
     def _chunk_section(self, text: str, heading_context: list[str]) -> list[str]:
         """Split a section into chunks if it's too large."""
-        tokens = self._estimate_tokens(text)
+        # Words need a separator, so a section holds at most (len + 1) // 2 of
+        # them; short sections fit without splitting or counting anything
+        if self._estimate_tokens((len(text) + 1) // 2) <= self.max_chunk_tokens:
+            return [text]
 
-        if tokens <= self.max_chunk_tokens:
+        paragraphs = _PARA_SPLIT_RE.split(text)
+
+        # Paragraph separators are whitespace, so these also sum to the section's count
+        para_words = [self._count_words(para) for para in paragraphs]
+
+        if self._estimate_tokens(sum(para_words)) <= self.max_chunk_tokens:
             return [text]
 
         # Split by paragraphs
-        paragraphs = text.split("\n\n")
         chunks = []
         current_chunk: list[str] = []
         current_tokens = 0
 
-        for para in paragraphs:
-            para_tokens = self._estimate_tokens(para)
+        for para, words in zip(paragraphs, para_words):
+            para_tokens = self._estimate_tokens(words)
 
             if current_tokens + para_tokens > self.max_chunk_tokens:
                 if current_chunk:
@@ -127,6 +132,10 @@ class DocumentChunker:
 
         return chunks
 
-    def _estimate_tokens(self, text: str) -> int:
+    def _count_words(self, text: str) -> int:
+        """Count whitespace-separated words."""
+        return len(text.split())
+
+    def _estimate_tokens(self, word_count: int) -> int:
         """Rough token estimation (words * 1.3)."""
-        return int(len(text.split()) * 1.3)
+        return int(word_count * 1.3)
@@ -4,6 +4,7 @@ import asyncio
 from collections.abc import AsyncIterator
 
 import httpx
+from aiolimiter import AsyncLimiter
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from ..shared.config import settings
@@ -16,40 +17,81 @@ class DocumentFetcher:
         self.rate_limit = rate_limit
         self.delay = 1.0 / rate_limit  # Delay between requests
         self.semaphore = asyncio.Semaphore(settings.max_concurrent)
-        self._last_request_time = 0.0
+        # One request per `delay` seconds, shared by all in-flight fetches
+        self.limiter = AsyncLimiter(1, self.delay)
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
-    async def fetch(self, url: str, client: httpx.AsyncClient) -> tuple[str, dict]:
-        """Fetch URL, return (html_content, headers)."""
-        async with self.semaphore:
-            # Rate limiting
-            now = asyncio.get_event_loop().time()
-            time_since_last = now - self._last_request_time
-            if time_since_last < self.delay:
-                await asyncio.sleep(self.delay - time_since_last)
+    async def fetch(
+        self,
+        url: str,
+        client: httpx.AsyncClient,
+        headers: dict[str, str] | None = None,
+    ) -> tuple[bytes | str | None, dict]:
+        """Fetch URL, return (html_content, headers).
 
-            response = await client.get(url, timeout=30.0, follow_redirects=True)
+        html_content is the raw response body, left undecoded unless the
+        server declares a non-UTF-8 charset. It is None when a conditional
+        request (If-None-Match / If-Modified-Since in `headers`) gets
+        304 Not Modified.
+        """
+        async with self.semaphore:
+            async with self.limiter:
+                response = await client.get(url, headers=headers, follow_redirects=True)
+            if response.status_code == httpx.codes.NOT_MODIFIED:
+                return (None, dict(response.headers))
             response.raise_for_status()
 
-            self._last_request_time = asyncio.get_event_loop().time()
-            return (response.text, dict(response.headers))
+            # The HTML parser reads bytes as UTF-8; decode anything else here
+            encoding = response.charset_encoding
+            if encoding and encoding.lower() not in ("utf-8", "utf8"):
+                return (response.text, dict(response.headers))
+            return (response.content, dict(response.headers))
+
+    async def _fetch_one(
+        self, url: str, client: httpx.AsyncClient, headers: dict[str, str] | None
+    ) -> tuple[str, bytes | str | None, dict, Exception | None]:
+        """Fetch a single URL, capturing any error instead of raising."""
+        try:
+            html, response_headers = await self.fetch(url, client, headers)
+            return (url, html, response_headers, None)
+        except Exception as e:
+            return (url, None, {}, e)
 
     async def fetch_batch(
-        self, urls: list[str]
-    ) -> AsyncIterator[tuple[str, str | None, Exception | None]]:
-        """Fetch multiple URLs with rate limiting.
+        self,
+        urls: list[str],
+        conditional_headers: dict[str, dict[str, str]] | None = None,
+    ) -> AsyncIterator[tuple[str, bytes | str | None, dict, Exception | None]]:
+        """Fetch multiple URLs concurrently with rate limiting.
 
-        Yields (url, html_content, error) tuples.
+        conditional_headers maps a URL to the validator headers sent with its
+        request. Yields (url, html_content, headers, error) tuples in
+        completion order; html_content is None for unmodified pages.
         """
+        conditional_headers = conditional_headers or {}
+
+        # HTTP/2 multiplexes concurrent requests over one connection to the CDN
         async with httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=settings.max_concurrent * 2,
+                max_keepalive_connections=settings.max_concurrent,
+                keepalive_expiry=30.0,
+            ),
+            timeout=httpx.Timeout(30.0, connect=10.0),
             headers={
                 "User-Agent": "DatabricksMCP/1.0 (documentation indexer)",
                 "Accept": "text/html,application/xhtml+xml",
-            }
+            },
         ) as client:
-            for url in urls:
-                try:
-                    html, _ = await self.fetch(url, client)
-                    yield (url, html, None)
-                except Exception as e:
-                    yield (url, None, e)
+            tasks = [
+                asyncio.create_task(self._fetch_one(url, client, conditional_headers.get(url)))
+                for url in urls
+            ]
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    yield await next_result
+            finally:
+                # Don't leave fetches running if the consumer stops early
+                for task in tasks:
+                    task.cancel()
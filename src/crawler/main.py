@@ -2,15 +2,20 @@
 
 import argparse
 import asyncio
-import json
+from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
 
 import chromadb
+import numpy as np
+import orjson
 from chromadb.utils import embedding_functions
 from tqdm import tqdm
 
 from ..shared.config import settings
-from ..shared.models import Section
+from ..shared.mmr import RELATED_CANDIDATES, RELATED_INDEX_SIZE, rank_related
+from ..shared.models import DocumentChunk
 from .chunker import DocumentChunker
 from .fetcher import DocumentFetcher
 from .parser import ContentParser
@@ -18,22 +23,62 @@ from .sitemap import SitemapParser
 from .state import StateManager
 
 
+class BatchedSentenceTransformerEmbeddingFunction(
+    embedding_functions.SentenceTransformerEmbeddingFunction
+):
+    """Sentence-transformer embedding function that encodes in larger batches."""
+
+    def __init__(self, model_name: str, normalize_embeddings: bool = False, **kwargs):
+        super().__init__(model_name=model_name, normalize_embeddings=normalize_embeddings, **kwargs)
+
+        # chromadb < 1.0 keeps these in private attributes, so hold our own
+        # references: the model from the public per-name cache, and the flag
+        self.batch_model = self.models[model_name]
+        self.normalize_embeddings = normalize_embeddings
+
+    def __call__(self, input):
+        embeddings = self.batch_model.encode(
+            list(input),
+            batch_size=settings.embedding_batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize_embeddings,
+        )
+        return list(embeddings)
+
+
 def get_collection():
     """Get or create ChromaDB collection."""
     settings.chroma_path.mkdir(parents=True, exist_ok=True)
     client = chromadb.PersistentClient(path=str(settings.chroma_path))
 
-    embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=settings.embedding_model
+    # Unit-length embeddings make inner product equal to cosine similarity,
+    # without normalizing vectors at every distance computation
+    embedding_fn = BatchedSentenceTransformerEmbeddingFunction(
+        model_name=settings.embedding_model,
+        normalize_embeddings=True,
     )
 
     return client.get_or_create_collection(
         name="databricks_docs",
         embedding_function=embedding_fn,
-        metadata={"hnsw:space": "cosine"},
+        metadata={"hnsw:space": "ip"},
     )
 
 
+@lru_cache(maxsize=None)
+def parent_paths(path: str) -> tuple[str, ...]:
+    """Return the ancestor paths of a documentation path, nearest first.
+
+    Example: /aws/en/compute --> ("/aws/en", "/aws")
+    """
+    parents = []
+    current = "/" + path.strip("/")
+    while "/" in current[1:]:
+        current = current.rsplit("/", 1)[0]
+        parents.append(current)
+    return tuple(parents)
+
+
 def generate_sections_index(collection) -> None:
     """Generate sections index for fast list-sections lookup."""
     # Get all unique paths and their metadata
@@ -42,41 +87,34 @@ def generate_sections_index(collection) -> None:
     if not results["ids"]:
         return
 
-    # Deduplicate by path, keeping first chunk's metadata
-    path_to_metadata: dict = {}
-    path_child_counts: dict[str, int] = {}
+    # Deduplicate by path, keeping first chunk's metadata. Sections are built
+    # as plain dicts with the same fields as the Section model.
+    sections_by_path: dict[str, dict] = {}
+    path_child_counts: Counter[str] = Counter()
+    categories = set()
 
     for metadata in results["metadatas"]:
         path = metadata["path"]
-        if path not in path_to_metadata:
-            path_to_metadata[path] = metadata
+        if path not in sections_by_path:
+            category = metadata.get("category", "other")
+            categories.add(category)
+            sections_by_path[path] = {
+                "title": metadata.get("title", "Untitled"),
+                "path": path,
+                "use_cases": get_use_cases(category),
+                "category": category,
+                "subcategory": metadata.get("subcategory"),
+                "child_count": 0,
+            }
 
         # Count children for parent paths
-        parts = path.strip("/").split("/")
-        for i in range(len(parts) - 1):
-            parent_path = "/" + "/".join(parts[: i + 1])
-            path_child_counts[parent_path] = path_child_counts.get(parent_path, 0) + 1
+        path_child_counts.update(parent_paths(path))
 
-    # Build sections list
-    sections = []
-    categories = set()
-
-    for path, metadata in path_to_metadata.items():
-        category = metadata.get("category", "other")
-        categories.add(category)
-
-        section = Section(
-            title=metadata.get("title", "Untitled"),
-            path=path,
-            category=category,
-            subcategory=metadata.get("subcategory"),
-            use_cases=get_use_cases(category),
-            child_count=path_child_counts.get(path, 0),
-        )
-        sections.append(section.model_dump())
+    for path, section in sections_by_path.items():
+        section["child_count"] = path_child_counts[path]
 
     # Sort by category then title
-    sections.sort(key=lambda s: (s["category"], s["title"]))
+    sections = sorted(sections_by_path.values(), key=itemgetter("category", "title"))
 
     index = {
         "sections": sections,
@@ -85,10 +123,187 @@ def generate_sections_index(collection) -> None:
     }
 
     settings.sections_index_path.parent.mkdir(parents=True, exist_ok=True)
-    settings.sections_index_path.write_text(json.dumps(index, indent=2))
+    settings.sections_index_path.write_bytes(orjson.dumps(index, option=orjson.OPT_INDENT_2))
     print(f"Generated sections index with {len(sections)} sections")
 
 
+def generate_indexes(collection) -> None:
+    """Generate the lookup files the MCP server loads at startup."""
+    generate_sections_index(collection)
+    if settings.vector_backend == "faiss":
+        export_faiss_store(collection)
+
+    # Each page is represented by its first chunk's embedding
+    results = collection.get(
+        where={"chunk_index": 0},
+        include=["embeddings", "metadatas"],
+    )
+
+    if not results["ids"]:
+        return
+
+    paths = [metadata["path"] for metadata in results["metadatas"]]
+    generate_breadcrumbs_index(results["metadatas"])
+    generate_embeddings_index(paths, results["embeddings"])
+    generate_related_index(collection, paths, results["embeddings"])
+
+
+def generate_breadcrumbs_index(metadatas: list[dict]) -> None:
+    """Save parsed breadcrumbs per path so the server doesn't decode them per request."""
+    breadcrumbs = {
+        metadata["path"]: orjson.loads(metadata.get("breadcrumb") or "[]")
+        for metadata in metadatas
+    }
+
+    settings.breadcrumbs_index_path.parent.mkdir(parents=True, exist_ok=True)
+    settings.breadcrumbs_index_path.write_bytes(orjson.dumps(breadcrumbs))
+    print(f"Generated breadcrumbs index for {len(breadcrumbs)} pages")
+
+
+def generate_embeddings_index(paths: list[str], embeddings: np.ndarray) -> None:
+    """Save first-chunk embeddings so the server can skip fetching them from ChromaDB."""
+    settings.embeddings_index_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        settings.embeddings_index_path,
+        paths=np.array(paths),
+        vecs=np.asarray(embeddings, dtype=np.float32),
+    )
+    print(f"Generated embeddings index for {len(paths)} pages")
+
+
+def generate_related_index(
+    collection,
+    paths: list[str],
+    embeddings: np.ndarray,
+    batch_size: int = 256,
+) -> None:
+    """Precompute related paths for every page from first-chunk similarity."""
+    related_index: dict[str, list[str]] = {}
+
+    # Candidate embeddings are only needed for MMR re-ranking
+    include = ["metadatas"]
+    if settings.related_mmr_lambda < 1.0:
+        include.append("embeddings")
+
+    # Query in batches of first-chunk embeddings, as the server would per page
+    for start in range(0, len(paths), batch_size):
+        batch = embeddings[start : start + batch_size]
+        similar = collection.query(
+            query_embeddings=list(batch),
+            n_results=RELATED_CANDIDATES,
+            include=include,
+        )
+        result_embeddings = similar.get("embeddings")
+
+        for i, path in enumerate(paths[start : start + batch_size]):
+            related_index[path] = rank_related(
+                path,
+                batch[i],
+                similar["metadatas"][i],
+                result_embeddings[i] if result_embeddings is not None else None,
+                limit=RELATED_INDEX_SIZE,
+                lambda_mult=settings.related_mmr_lambda,
+            )
+
+    settings.related_index_path.parent.mkdir(parents=True, exist_ok=True)
+    settings.related_index_path.write_bytes(orjson.dumps(related_index))
+    print(f"Generated related index for {len(related_index)} pages")
+
+
+def export_faiss_store(collection) -> None:
+    """Export all chunks as a FAISS index of their vectors plus a Parquet payload table.
+
+    Row i of the table describes vector i of the index. Rows are sorted by
+    path and chunk index, so each page's chunks form one ordered run.
+    """
+    # Optional "faiss" extra, only needed with vector_backend = "faiss"
+    import faiss
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    results = collection.get(include=["embeddings", "documents", "metadatas"])
+
+    if not results["ids"]:
+        return
+
+    metadatas = results["metadatas"]
+    order = sorted(
+        range(len(metadatas)),
+        key=lambda i: (metadatas[i]["path"], metadatas[i].get("chunk_index", 0)),
+    )
+
+    # Embeddings are unit length, so inner product ranks by cosine similarity
+    vecs = np.ascontiguousarray(np.asarray(results["embeddings"], dtype=np.float32)[order])
+    index = faiss.IndexFlatIP(vecs.shape[1])
+    index.add(vecs)
+
+    def column(key: str, default=None) -> list:
+        return [metadatas[i].get(key, default) for i in order]
+
+    table = pa.table(
+        {
+            "id": [results["ids"][i] for i in order],
+            "path": column("path"),
+            "title": column("title", "Untitled"),
+            "category": column("category", "other"),
+            "subcategory": column("subcategory", ""),
+            "chunk_index": pa.array(column("chunk_index", 0), type=pa.int32()),
+            "breadcrumb": column("breadcrumb", "[]"),
+            "document": [results["documents"][i] for i in order],
+        }
+    )
+
+    settings.faiss_index_path.parent.mkdir(parents=True, exist_ok=True)
+    settings.documents_path.parent.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(index, str(settings.faiss_index_path))
+    pq.write_table(table, settings.documents_path)
+    print(f"Exported {index.ntotal} chunks to FAISS index and Parquet table")
+
+
+def store_chunks(collection, chunks: list[DocumentChunk]) -> None:
+    """Replace stored chunks for every document in `chunks` with one write."""
+    # Build the upsert columns in one pass. Document-level fields are
+    # identical for all chunks of a page, so they're built once per page.
+    ids: list[str] = []
+    documents: list[str] = []
+    metadatas: list[dict] = []
+    page_fields: dict[str, dict] = {}  # document_id -> shared metadata
+
+    for c in chunks:
+        shared = page_fields.get(c.document_id)
+        if shared is None:
+            m = c.metadata
+            shared = page_fields[c.document_id] = {
+                "url": m.url,
+                "path": m.path,
+                "title": m.title,
+                "category": m.category,
+                "subcategory": m.subcategory or "",
+                "breadcrumb": orjson.dumps(m.breadcrumb).decode(),
+                "document_id": c.document_id,
+                "content_hash": m.content_hash,
+            }
+
+        ids.append(c.id)
+        documents.append(c.content)
+        metadatas.append(
+            {
+                **shared,
+                "chunk_index": c.chunk_index,
+                "heading_context": orjson.dumps(c.heading_context).decode(),
+            }
+        )
+
+    # Delete old chunks for these documents
+    try:
+        collection.delete(where={"document_id": {"$in": list(page_fields)}})
+    except Exception:
+        pass
+
+    # Store new chunks
+    collection.upsert(ids=ids, documents=documents, metadatas=metadatas)
+
+
 def get_use_cases(category: str) -> list[str]:
     """Return common use cases for a category."""
     use_case_map = {
@@ -137,12 +352,11 @@ async def crawl(full: bool = False, new_only: bool = False, limit: int | None =
         deleted = state.get_deleted_urls(set(all_urls))
         if deleted:
             print(f"Removing {len(deleted)} deleted pages from index...")
-            for url in deleted:
-                doc_id = state.compute_hash(url)
-                try:
-                    collection.delete(where={"document_id": doc_id})
-                except Exception:
-                    pass
+            doc_ids = [chunker.document_id(url) for url in deleted]
+            try:
+                collection.delete(where={"document_id": {"$in": doc_ids}})
+            except Exception:
+                pass
 
     # 3. Filter URLs based on mode
     if full:
@@ -164,18 +378,58 @@ async def crawl(full: bool = False, new_only: bool = False, limit: int | None =
 
     if not urls:
         print("No pages need updating.")
-        generate_sections_index(collection)
+        generate_indexes(collection)
         return
 
     # 4. Fetch and process pages
     updated = 0
+    not_modified = 0
     errors = 0
     total_chunks = 0
 
+    # Chunks are buffered and written in batches so the embedding model
+    # encodes many pages per forward pass
+    pending_chunks: list[DocumentChunk] = []
+    # document_id -> (url, content_hash, response headers)
+    pending_pages: dict[str, tuple[str, str, dict]] = {}
+
+    async def flush() -> None:
+        nonlocal updated, errors, total_chunks
+        if not pending_chunks:
+            return
+        try:
+            # Embedding runs in a worker thread so in-flight fetches keep progressing
+            await asyncio.to_thread(store_chunks, collection, pending_chunks)
+        except Exception as e:
+            tqdm.write(f"Error storing {len(pending_pages)} pages: {e}")
+            errors += len(pending_pages)
+            # Old chunks may already be deleted, so don't let a stored hash or
+            # ETag/Last-Modified make the next run skip these pages
+            for url, _, _ in pending_pages.values():
+                state.forget(url)
+        else:
+            # Update state only once the chunks are persisted
+            for url, content_hash, headers in pending_pages.values():
+                state.mark_crawled(
+                    url,
+                    content_hash,
+                    etag=headers.get("etag"),
+                    last_modified=headers.get("last-modified"),
+                )
+            updated += len(pending_pages)
+            total_chunks += len(pending_chunks)
+        pending_chunks.clear()
+        pending_pages.clear()
+
+    # Let the server skip sending pages that haven't changed (unless full crawl)
+    conditional_headers = {}
+    if not full:
+        conditional_headers = {url: state.get_conditional_headers(url) for url in urls}
+
     print(f"Crawling {len(urls)} documentation pages...")
     pbar = tqdm(total=len(urls), desc="Crawling")
 
-    async for url, html, error in fetcher.fetch_batch(urls):
+    async for url, html, headers, error in fetcher.fetch_batch(urls, conditional_headers):
         pbar.update(1)
 
         if error:
@@ -184,74 +438,64 @@ async def crawl(full: bool = False, new_only: bool = False, limit: int | None =
             continue
 
         if html is None:
+            # 304 Not Modified
+            state.mark_not_modified(url)
+            not_modified += 1
             continue
 
         content_hash = state.compute_hash(html)
 
-        # Skip if unchanged (unless full crawl)
+        # Skip if unchanged (unless full crawl), recording the new validators
         if not full and not state.needs_update(url, content_hash):
+            state.mark_crawled(
+                url,
+                content_hash,
+                etag=headers.get("etag"),
+                last_modified=headers.get("last-modified"),
+            )
             continue
 
         try:
-            # Parse HTML
-            markdown, metadata = parser.parse(html, url)
+            # Parse HTML off the event loop
+            markdown, metadata = await asyncio.to_thread(parser.parse, html, url)
             metadata.content_hash = content_hash
 
             # Chunk content
             chunks = chunker.chunk(markdown, metadata)
+        except Exception as e:
+            tqdm.write(f"Error processing {url}: {e}")
+            errors += 1
+            continue
 
-            if not chunks:
-                continue
-
-            # Delete old chunks for this document
-            doc_id = chunks[0].document_id
-            try:
-                collection.delete(where={"document_id": doc_id})
-            except Exception:
-                pass
+        if not chunks:
+            continue
 
-            # Store new chunks
-            collection.upsert(
-                ids=[c.id for c in chunks],
-                documents=[c.content for c in chunks],
-                metadatas=[
-                    {
-                        "url": c.metadata.url,
-                        "path": c.metadata.path,
-                        "title": c.metadata.title,
-                        "category": c.metadata.category,
-                        "subcategory": c.metadata.subcategory or "",
-                        "breadcrumb": json.dumps(c.metadata.breadcrumb),
-                        "chunk_index": c.chunk_index,
-                        "heading_context": json.dumps(c.heading_context),
-                        "document_id": c.document_id,
-                        "content_hash": c.metadata.content_hash,
-                    }
-                    for c in chunks
-                ],
-            )
+        # Chunk IDs must be unique within a write
+        doc_id = chunks[0].document_id
+        if doc_id in pending_pages:
+            await flush()
 
-            # Update state
-            state.mark_crawled(url, content_hash)
-            updated += 1
-            total_chunks += len(chunks)
+        pending_chunks.extend(chunks)
+        pending_pages[doc_id] = (url, content_hash, headers)
 
-        except Exception as e:
-            tqdm.write(f"Error processing {url}: {e}")
-            errors += 1
+        if len(pending_chunks) >= settings.upsert_batch_size:
+            await flush()
 
+    await flush()
     pbar.close()
 
-    # 4. Save state and generate sections index
+    # 4. Save state and generate the server's indexes
     state.update_stats(len(urls), collection.count())
     state.save()
 
-    generate_sections_index(collection)
+    generate_indexes(collection)
 
     print(f"\nCrawl complete:")
     print(f"  - Pages processed: {updated}")
     if skipped > 0:
         print(f"  - Pages skipped (fresh): {skipped}")
+    if not_modified > 0:
+        print(f"  - Pages not modified: {not_modified}")
     print(f"  - Errors: {errors}")
     print(f"  - Total chunks in database: {collection.count()}")
 
@@ -1,7 +1,11 @@
 """HTML parsing and content extraction."""
 
+import re
+
+import soupsieve as sv
 from bs4 import BeautifulSoup
 from markdownify import markdownify as md
+from selectolax.lexbor import LexborHTMLParser, LexborNode
 
 from ..shared.config import settings
 from ..shared.models import DocumentMetadata
@@ -36,42 +40,66 @@ class ContentParser:
         ".theme-doc-footer",
     ]
 
+    BREADCRUMB_SELECTORS = [
+        ".breadcrumbs",
+        "[aria-label='breadcrumbs']",
+        ".breadcrumb",
+        "nav.breadcrumbs",
+    ]
+
+    # Union selectors so unwanted nodes and breadcrumbs are found in one traversal
+    REMOVE_SELECTOR = ",".join(REMOVE_SELECTORS)
+    BREADCRUMB_SELECTOR = ",".join(BREADCRUMB_SELECTORS)
+
+    # Compiled for the BeautifulSoup fallback
+    REMOVE_MATCHER = sv.compile(REMOVE_SELECTOR)
+
+    # Blank-line cleanup for converted markdown
+    _LEAD_BLANK = re.compile(r"\A\s*(?:\n|\Z)")  # whitespace-only leading lines
+    _TAIL_BLANK = re.compile(r"\n\s*\Z")  # whitespace-only trailing lines
+    _BLANK_RUN = re.compile(r"\n{3,}")
+
     def __init__(self):
         self.sitemap_parser = SitemapParser()
 
-    def parse(self, html: str, url: str) -> tuple[str, DocumentMetadata]:
+    def parse(self, html: bytes | str, url: str) -> tuple[str, DocumentMetadata]:
         """Parse HTML and return (markdown_content, metadata).
 
         1. Extract main content area
         2. Remove navigation elements
         3. Convert to markdown
         4. Extract metadata (title, breadcrumbs, etc.)
+
+        Bytes are parsed as UTF-8 without decoding to str first.
         """
-        soup = BeautifulSoup(html, "lxml")
+        tree = LexborHTMLParser(html)
 
         # Extract metadata first
-        title = self._extract_title(soup)
-        breadcrumbs = self._extract_breadcrumbs(soup)
+        title = self._extract_title(tree)
+        breadcrumbs = self._extract_breadcrumbs(tree)
         category, subcategory = self.sitemap_parser.categorize_url(url)
 
         # Find main content
-        content_element = None
+        content_node = None
         for selector in self.CONTENT_SELECTORS:
-            content_element = soup.select_one(selector)
-            if content_element:
+            content_node = tree.css_first(selector)
+            if content_node:
                 break
 
-        if not content_element:
+        if content_node:
+            self._remove_unwanted(content_node)
+            content_html = content_node.html
+        else:
+            # No known content container; fall back to BeautifulSoup's body handling
+            soup = BeautifulSoup(html, "lxml")
             content_element = soup.body or soup
-
-        # Remove unwanted elements
-        for selector in self.REMOVE_SELECTORS:
-            for element in content_element.select(selector):
+            for element in self.REMOVE_MATCHER.select(content_element):
                 element.decompose()
+            content_html = str(content_element)
 
         # Convert to markdown
         markdown = md(
-            str(content_element),
+            content_html,
             heading_style="ATX",
             bullets="-",
             code_language="",
@@ -81,7 +109,7 @@ class ContentParser:
         markdown = self._clean_markdown(markdown)
 
         # Build path from URL
-        path = url.replace(settings.base_url, "")
+        path = url.removeprefix(settings.base_url)
 
         metadata = DocumentMetadata(
             url=url,
@@ -94,22 +122,31 @@ class ContentParser:
 
         return (markdown, metadata)
 
-    def _extract_title(self, soup: BeautifulSoup) -> str:
+    def _remove_unwanted(self, content_node: LexborNode) -> None:
+        """Remove navigation and other non-content nodes in place."""
+        # A node matching several selectors is returned once per match
+        unique = {node.mem_id: node for node in content_node.css(self.REMOVE_SELECTOR)}
+
+        # Decompose in reverse document order so children go before their parents
+        for node in reversed(unique.values()):
+            node.decompose()
+
+    def _extract_title(self, tree: LexborHTMLParser) -> str:
         """Extract page title from H1 or meta tags."""
         # Try H1 first
-        h1 = soup.find("h1")
+        h1 = tree.css_first("h1")
         if h1:
-            return h1.get_text(strip=True)
+            return h1.text(strip=True)
 
         # Try meta title
-        meta_title = soup.find("meta", property="og:title")
-        if meta_title and meta_title.get("content"):
-            return meta_title["content"]
+        meta_title = tree.css_first("meta[property='og:title']")
+        if meta_title and meta_title.attributes.get("content"):
+            return meta_title.attributes["content"]
 
         # Try title tag
-        title_tag = soup.find("title")
+        title_tag = tree.css_first("title")
         if title_tag:
-            title = title_tag.get_text(strip=True)
+            title = title_tag.text(strip=True)
             # Remove " | Databricks" suffix
             if "|" in title:
                 title = title.split("|")[0].strip()
@@ -117,48 +154,24 @@ class ContentParser:
 
         return "Untitled"
 
-    def _extract_breadcrumbs(self, soup: BeautifulSoup) -> list[str]:
+    def _extract_breadcrumbs(self, tree: LexborHTMLParser) -> list[str]:
         """Extract navigation breadcrumb trail."""
         breadcrumbs = []
 
-        # Try common breadcrumb selectors
-        breadcrumb_selectors = [
-            ".breadcrumbs",
-            "[aria-label='breadcrumbs']",
-            ".breadcrumb",
-            "nav.breadcrumbs",
-        ]
-
-        for selector in breadcrumb_selectors:
-            breadcrumb_nav = soup.select_one(selector)
-            if breadcrumb_nav:
-                links = breadcrumb_nav.find_all("a")
-                breadcrumbs = [link.get_text(strip=True) for link in links if link.get_text(strip=True)]
-                if breadcrumbs:
-                    break
+        # Try common breadcrumb containers in document order
+        for breadcrumb_nav in tree.css(self.BREADCRUMB_SELECTOR):
+            texts = [link.text(strip=True) for link in breadcrumb_nav.css("a")]
+            breadcrumbs = [text for text in texts if text]
+            if breadcrumbs:
+                break
 
         return breadcrumbs
 
     def _clean_markdown(self, markdown: str) -> str:
         """Clean up converted markdown."""
-        lines = markdown.split("\n")
-        cleaned_lines = []
-
-        for line in lines:
-            # Skip empty lines at the start
-            if not cleaned_lines and not line.strip():
-                continue
-            cleaned_lines.append(line)
-
-        # Remove trailing empty lines
-        while cleaned_lines and not cleaned_lines[-1].strip():
-            cleaned_lines.pop()
-
-        # Join and normalize multiple blank lines
-        result = "\n".join(cleaned_lines)
-
         # Replace multiple consecutive blank lines with double
-        while "\n\n\n" in result:
-            result = result.replace("\n\n\n", "\n\n")
+        result = self._BLANK_RUN.sub("\n\n", markdown)
 
-        return result
+        # Strip blank lines at the start and end
+        result = self._LEAD_BLANK.sub("", result, count=1)
+        return self._TAIL_BLANK.sub("", result, count=1)
@@ -1,5 +1,6 @@
 """Sitemap parsing and URL extraction."""
 
+import re
 from xml.etree import ElementTree
 
 import httpx
@@ -12,35 +13,43 @@ class SitemapParser:
 
     SITEMAP_URL = settings.sitemap_url
     DISALLOWED_PATTERNS = ["/archive/", "/search-for", "?s="]
+    _DISALLOWED_RE = re.compile("|".join(map(re.escape, DISALLOWED_PATTERNS)))
+
+    URL_TAG = "{http://www.sitemaps.org/schemas/sitemap/0.9}url"
+    LOC_TAG = "{http://www.sitemaps.org/schemas/sitemap/0.9}loc"
 
     async def fetch_urls(self) -> list[str]:
         """Fetch and parse sitemap, returning allowed URLs."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(self.SITEMAP_URL, timeout=30.0)
-            response.raise_for_status()
+        parser = ElementTree.XMLPullParser(events=("end",))
+        urls: list[str] = []
 
-        urls = self._parse_sitemap(response.text)
+        # Parse while downloading instead of building the whole document first
+        async with httpx.AsyncClient() as client:
+            async with client.stream("GET", self.SITEMAP_URL, timeout=30.0) as response:
+                response.raise_for_status()
+                async for data in response.aiter_bytes():
+                    parser.feed(data)
+                    urls.extend(self._read_urls(parser))
+
+        parser.close()
+        urls.extend(self._read_urls(parser))
         return self.filter_urls(urls)
 
-    def _parse_sitemap(self, xml_content: str) -> list[str]:
-        """Parse sitemap XML and extract URLs."""
-        root = ElementTree.fromstring(xml_content)
-        namespace = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-
+    def _read_urls(self, parser: ElementTree.XMLPullParser) -> list[str]:
+        """Extract URLs from the <url> elements parsed so far."""
         urls = []
-        for url_element in root.findall(".//sm:url/sm:loc", namespace):
-            if url_element.text:
-                urls.append(url_element.text.strip())
+        for _, element in parser.read_events():
+            if element.tag == self.URL_TAG:
+                loc = element.find(self.LOC_TAG)
+                if loc is not None and loc.text:
+                    urls.append(loc.text.strip())
+                element.clear()  # Free the entry once read
 
         return urls
 
     def filter_urls(self, urls: list[str]) -> list[str]:
         """Filter URLs based on robots.txt rules."""
-        filtered = []
-        for url in urls:
-            if not any(pattern in url for pattern in self.DISALLOWED_PATTERNS):
-                filtered.append(url)
-        return filtered
+        return [url for url in urls if not self._DISALLOWED_RE.search(url)]
 
     def categorize_url(self, url: str) -> tuple[str, str | None]:
         """Extract category and subcategory from URL path.
@@ -48,7 +57,7 @@ class SitemapParser:
         Example: /aws/en/compute/clusters --> ("compute", "clusters")
         """
         # Extract path from URL
-        path = url.replace(settings.base_url, "")
+        path = url.removeprefix(settings.base_url)
         parts = [p for p in path.split("/") if p]
 
         # Skip cloud and language parts (aws, en)
@@ -1,20 +1,32 @@
 """Crawl state management for incremental updates."""
 
-import json
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Annotated, Any
 
 import xxhash
-from pydantic import BaseModel
+from pydantic import BaseModel, BeforeValidator
 
 from ..shared.config import settings
 
 
-class UrlState(BaseModel):
+def _to_timestamp(value: Any) -> Any:
+    """Convert ISO datetimes written by older state files to Unix timestamps."""
+    if isinstance(value, str):
+        return int(datetime.fromisoformat(value).timestamp())
+    return value
+
+
+@dataclass(slots=True)
+class UrlState:
     """State for a single URL."""
 
     content_hash: str
-    last_fetched: datetime
+    last_fetched: Annotated[int, BeforeValidator(_to_timestamp)]  # Unix timestamp
+    etag: str | None = None
+    last_modified: str | None = None
 
 
 class CrawlState(BaseModel):
@@ -43,12 +55,12 @@ class StateManager:
         """Load existing state or create new."""
         if self.state_path.exists():
             try:
-                data = json.loads(self.state_path.read_text())
-                state = CrawlState(**data)
+                # Parse and validate straight from bytes in pydantic-core
+                state = CrawlState.model_validate_json(self.state_path.read_bytes())
 
                 # Migrate legacy url_hashes to url_states
                 if state.url_hashes and not state.url_states:
-                    now = datetime.now()
+                    now = int(time.time())
                     for url, content_hash in state.url_hashes.items():
                         state.url_states[url] = UrlState(
                             content_hash=content_hash,
@@ -57,7 +69,7 @@ class StateManager:
                     state.url_hashes = None
 
                 return state
-            except (json.JSONDecodeError, ValueError):
+            except ValueError:
                 return CrawlState()
         return CrawlState()
 
@@ -67,8 +79,8 @@ class StateManager:
         if not url_state:
             return False
 
-        age = datetime.now() - url_state.last_fetched
-        return age < self.FRESHNESS_THRESHOLD
+        age = time.time() - url_state.last_fetched
+        return age < self.FRESHNESS_THRESHOLD.total_seconds()
 
     def needs_update(self, url: str, content_hash: str) -> bool:
         """Check if URL content has changed."""
@@ -77,17 +89,48 @@ class StateManager:
             return True
         return url_state.content_hash != content_hash
 
-    def compute_hash(self, content: str) -> str:
+    def compute_hash(self, content: str | bytes) -> str:
         """Compute fast hash of content."""
-        return xxhash.xxh64(content.encode()).hexdigest()
+        if isinstance(content, str):
+            content = content.encode()
+        return xxhash.xxh3_64_hexdigest(content)
 
-    def mark_crawled(self, url: str, content_hash: str) -> None:
+    def get_conditional_headers(self, url: str) -> dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers from stored validators."""
+        url_state = self.state.url_states.get(url)
+        headers: dict[str, str] = {}
+        if url_state:
+            if url_state.etag:
+                headers["If-None-Match"] = url_state.etag
+            if url_state.last_modified:
+                headers["If-Modified-Since"] = url_state.last_modified
+        return headers
+
+    def mark_crawled(
+        self,
+        url: str,
+        content_hash: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
         """Update state for crawled URL."""
         self.state.url_states[url] = UrlState(
             content_hash=content_hash,
-            last_fetched=datetime.now(),
+            last_fetched=int(time.time()),
+            etag=etag,
+            last_modified=last_modified,
         )
 
+    def mark_not_modified(self, url: str) -> None:
+        """Refresh fetch time for a URL the server reported as unchanged."""
+        url_state = self.state.url_states.get(url)
+        if url_state:
+            url_state.last_fetched = int(time.time())
+
+    def forget(self, url: str) -> None:
+        """Drop stored state for a URL so the next crawl fetches and stores it again."""
+        self.state.url_states.pop(url, None)
+
     def get_deleted_urls(self, current_urls: set[str]) -> set[str]:
         """Find URLs that were removed from sitemap."""
         return set(self.state.url_states.keys()) - current_urls
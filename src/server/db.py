@@ -1,217 +1,531 @@
 """ChromaDB query interface for MCP server."""
 
-import json
+import asyncio
+import logging
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
 from pathlib import Path
+from urllib.parse import urlsplit
 
 import chromadb
+import numpy as np
+import orjson
+import torch
 from chromadb.utils import embedding_functions
 
 from ..shared.config import settings
-from ..shared.models import DocumentationContent, Section, SectionList
+from ..shared.mmr import RELATED_CANDIDATES, rank_related
+from ..shared.models import DocumentationContentDict, Section, SectionDict, SectionListDict
+
+# Common use cases per category, shown with search results
+_USE_CASE_MAP: dict[str, tuple[str, ...]] = {
+    "compute": ("Create and manage clusters", "Configure autoscaling", "Use serverless compute"),
+    "delta": ("Create Delta tables", "Optimize table performance", "Use time travel"),
+    "admin": ("Manage workspaces", "Configure users and groups", "Set up SSO"),
+    "data-governance": ("Set up Unity Catalog", "Configure access control", "Track data lineage"),
+    "dev-tools": ("Use Databricks CLI", "Configure asset bundles", "API authentication"),
+    "connect": ("Connect to storage", "Set up streaming", "External integrations"),
+    "sql": ("Write SQL queries", "Use SQL functions", "Query optimization"),
+    "machine-learning": ("Train ML models", "Track experiments", "Deploy models"),
+    "generative-ai": ("Use AI features", "Build AI applications", "LLM integration"),
+    "workflows": ("Create jobs", "Schedule workflows", "Monitor runs"),
+    "notebooks": ("Create notebooks", "Use magic commands", "Visualize data"),
+    "dashboards": ("Create dashboards", "Build visualizations", "Share insights"),
+}
+_DEFAULT_USE_CASES = ("General documentation",)
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=4)
+def _get_embedding_fn(model_name: str) -> embedding_functions.SentenceTransformerEmbeddingFunction:
+    """Build the query embedding function, shared by all DocumentDatabase instances.
+
+    Chroma itself keeps one loaded SentenceTransformer per model name for the
+    whole process, so this only saves re-creating the wrapper. The model
+    loads with the embedding_backend in effect when it is first requested.
+    """
+    if settings.embedding_backend == "onnx":
+        # Quantized ONNX export run by ONNX Runtime; needs the "onnx" extra
+        return embedding_functions.SentenceTransformerEmbeddingFunction(
+            model_name=model_name,
+            normalize_embeddings=True,
+            backend="onnx",
+            model_kwargs={"file_name": settings.embedding_onnx_file},
+        )
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name=model_name,
+        device="cuda" if torch.cuda.is_available() else "cpu",
+        normalize_embeddings=True,
+    )
 
 
 class DocumentDatabase:
-    """Query interface for documentation storage."""
+    """Query interface for documentation storage.
+
+    Queries go to a Chroma server through the async HTTP client when
+    chroma_http_url is set, otherwise to the local persistent store. Stored
+    chunks are only reached through _has_store, _similar_chunks, _fetch_chunks
+    and _fetch_first_chunk_embeddings, which other backends override.
+    """
+
+    # Number of (path, limit) related-path results kept in memory
+    RELATED_CACHE_SIZE = 2048
 
     def __init__(
         self,
         persist_directory: Path = settings.chroma_path,
         sections_index_path: Path = settings.sections_index_path,
+        related_index_path: Path = settings.related_index_path,
+        embeddings_index_path: Path = settings.embeddings_index_path,
+        breadcrumbs_index_path: Path = settings.breadcrumbs_index_path,
+        chroma_http_url: str | None = settings.chroma_http_url,
     ):
-        self.client = chromadb.PersistentClient(path=str(persist_directory))
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=settings.embedding_model
+        self._init_common(
+            sections_index_path,
+            related_index_path,
+            embeddings_index_path,
+            breadcrumbs_index_path,
         )
 
-        try:
-            self.collection = self.client.get_collection(
-                name="databricks_docs",
-                embedding_function=self.embedding_fn,
-            )
-        except Exception:
-            # Collection doesn't exist yet - crawler hasn't run
+        self.chroma_http_url = chroma_http_url
+        self._connected = False
+        self._connect_lock = asyncio.Lock()
+
+        if chroma_http_url:
+            # The async client is created on first use, inside the event loop
+            self.client = None
             self.collection = None
+        else:
+            self.client = chromadb.PersistentClient(path=str(persist_directory))
+            try:
+                self.collection = self.client.get_collection(
+                    name="databricks_docs",
+                    embedding_function=self.embedding_fn,
+                )
+            except Exception:
+                # Collection doesn't exist yet - crawler hasn't run
+                self.collection = None
+            else:
+                self._check_space(self.collection, persist_directory=persist_directory)
+            self._connected = True
+
+    def _init_common(
+        self,
+        sections_index_path: Path,
+        related_index_path: Path,
+        embeddings_index_path: Path,
+        breadcrumbs_index_path: Path,
+    ) -> None:
+        """Set up the embedding model, caches and crawler indexes of any backend."""
+        self.embedding_fn = _get_embedding_fn(settings.embedding_model)
+
+        # Repeated search queries reuse their embedding instead of re-running the model
+        self._embed = lru_cache(maxsize=1024)(self._encode_query)
+
+        # Related paths are fixed for a crawled corpus, so cache them per (path, limit)
+        self._related_cache: OrderedDict[tuple[str, int], tuple[str, ...]] = OrderedDict()
+        self._emb_cache: dict[str, np.ndarray] = {}  # path -> first chunk embedding
 
         self.sections_index = self._load_sections_index(sections_index_path)
 
+        # Validate sections once at load; list_sections only slices these
+        self._sections: list[SectionDict] = [
+            Section(**s).model_dump() for s in self.sections_index.get("sections", [])
+        ]
+        self._sections_by_category: dict[str, list[SectionDict]] = defaultdict(list)
+        for section in self._sections:
+            self._sections_by_category[section["category"]].append(section)
+
+        # Related paths precomputed by the crawler; live queries only cover misses
+        self._related_map = self._load_related_index(related_index_path)
+
+        # First-chunk embeddings saved by the crawler, so misses skip a store lookup
+        self._path_to_vec = self._load_embeddings_index(embeddings_index_path)
+
+        # Breadcrumbs parsed by the crawler (path -> breadcrumb)
+        self._breadcrumb_map = self._load_breadcrumbs_index(breadcrumbs_index_path)
+
     def _load_sections_index(self, path: Path) -> dict:
         """Load pre-computed sections index."""
         if path.exists():
             try:
-                return json.loads(path.read_text())
-            except (json.JSONDecodeError, OSError):
+                # orjson parses straight from the bytes, without decoding to str first
+                return orjson.loads(path.read_bytes())
+            except (orjson.JSONDecodeError, OSError):
                 pass
         return {"sections": [], "categories": [], "total_count": 0}
 
-    def list_sections(
+    def _load_related_index(self, path: Path) -> dict[str, list[str]]:
+        """Load pre-computed related paths (path -> related paths)."""
+        if path.exists():
+            try:
+                return orjson.loads(path.read_bytes())
+            except (orjson.JSONDecodeError, OSError):
+                pass
+        return {}
+
+    def _load_breadcrumbs_index(self, path: Path) -> dict[str, list[str]]:
+        """Load pre-parsed breadcrumbs (path -> breadcrumb)."""
+        if path.exists():
+            try:
+                return orjson.loads(path.read_bytes())
+            except (orjson.JSONDecodeError, OSError):
+                pass
+        return {}
+
+    def _load_embeddings_index(self, path: Path) -> dict[str, np.ndarray]:
+        """Load pre-computed first-chunk embeddings (path -> vector)."""
+        if path.exists():
+            try:
+                with np.load(path) as data:
+                    return dict(zip(data["paths"].tolist(), data["vecs"]))
+            except (OSError, KeyError, ValueError):
+                pass
+        return {}
+
+    async def _get_collection(self):
+        """Return the collection, connecting to the Chroma server on first use."""
+        if not self._connected:
+            async with self._connect_lock:
+                if not self._connected:
+                    self.collection = await self._connect_http(self.chroma_http_url)
+                    self._connected = True
+        return self.collection
+
+    async def _connect_http(self, url: str):
+        """Open the documentation collection on a Chroma server."""
+        parts = urlsplit(url)
+        self.client = await chromadb.AsyncHttpClient(
+            host=parts.hostname or "localhost",
+            port=parts.port or (443 if parts.scheme == "https" else 8000),
+            ssl=parts.scheme == "https",
+        )
+        try:
+            collection = await self.client.get_collection(
+                name="databricks_docs",
+                embedding_function=self.embedding_fn,
+            )
+        except Exception:
+            # Collection doesn't exist yet - crawler hasn't run
+            return None
+
+        self._check_space(collection)
+        return collection
+
+    def _check_space(self, collection, persist_directory: Path | None = None) -> None:
+        """Warn if the collection doesn't use inner-product distance."""
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        if space == "ip":
+            return
+
+        # Results are still correct for unit vectors, just slower to score. A
+        # default crawl skips pages already in the crawl state, so only a
+        # --full crawl refills a deleted store.
+        if persist_directory is not None:
+            rebuild = f"Delete {persist_directory} and rebuild it with `crawl --full`."
+        else:
+            rebuild = (
+                f"Delete the store the Chroma server at {self.chroma_http_url} serves, "
+                "rebuild it with `crawl --full` and restart the server."
+            )
+        logger.warning(
+            "Collection uses %r distance; embeddings are normalized, so 'ip' is faster. %s",
+            space,
+            rebuild,
+        )
+
+    async def _call(self, method: str, **kwargs):
+        """Run a collection method without blocking the event loop."""
+        if self.chroma_http_url:
+            return await getattr(self.collection, method)(**kwargs)
+
+        # The persistent client is synchronous, so it runs in a worker thread
+        return await asyncio.to_thread(getattr(self.collection, method), **kwargs)
+
+    async def _has_store(self) -> bool:
+        """Return whether crawled chunks are available to query."""
+        return await self._get_collection() is not None
+
+    async def _similar_chunks(
+        self,
+        query_embeddings: list,
+        n_results: int,
+        category: str | None = None,
+        include_embeddings: bool = False,
+    ) -> tuple[list[list[dict]], list | None]:
+        """Find the chunks nearest to each query embedding.
+
+        Returns the chunk metadatas per query, and their embeddings when
+        include_embeddings is set (otherwise None).
+        """
+        include = ["metadatas"]
+        if include_embeddings:
+            include.append("embeddings")
+
+        results = await self._call(
+            "query",
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where={"category": category} if category else None,
+            include=include,
+        )
+        metadatas = results["metadatas"] or [[] for _ in query_embeddings]
+        return metadatas, results.get("embeddings") if include_embeddings else None
+
+    async def _fetch_chunks(self, paths: list[str]) -> tuple[list[str], list[dict]]:
+        """Return the documents and metadatas of every chunk of the given paths."""
+        results = await self._call(
+            "get",
+            where={"path": {"$in": paths}},
+            include=["documents", "metadatas"],
+        )
+        return results["documents"], results["metadatas"]
+
+    async def _fetch_first_chunk_embeddings(self, paths: list[str]) -> dict[str, np.ndarray]:
+        """Fetch the embeddings of documents' first chunks from the store."""
+        results = await self._call(
+            "get",
+            where={"$and": [{"path": {"$in": paths}}, {"chunk_index": 0}]},
+            include=["embeddings", "metadatas"],
+        )
+
+        # Embeddings come back as a 2D numpy array
+        return {
+            metadata["path"]: embedding
+            for metadata, embedding in zip(results["metadatas"], results["embeddings"])
+        }
+
+    def _encode_query(self, query: str):
+        """Embed a single search query."""
+        return self.embedding_fn([query])[0]
+
+    async def list_sections(
         self,
         category: str | None = None,
         search_query: str | None = None,
         limit: int = 50,
-    ) -> SectionList:
+    ) -> SectionListDict:
         """List documentation sections.
 
         If search_query provided, uses semantic search.
         Otherwise, returns from pre-computed index.
         """
-        if search_query and self.collection:
-            # Semantic search using embeddings
-            results = self.collection.query(
-                query_texts=[search_query],
+        if search_query and await self._has_store():
+            # Encoding is CPU-bound, so uncached queries run in a worker thread
+            query_embedding = await asyncio.to_thread(self._embed, search_query)
+
+            # Semantic search using embeddings, filtered by category inside the store
+            metadatas, _ = await self._similar_chunks(
+                [query_embedding],
                 n_results=min(limit * 3, 100),  # Get more to deduplicate
-                include=["metadatas"],
+                category=category,
             )
 
-            # Deduplicate by path and convert to sections
-            seen_paths: set[str] = set()
-            sections = []
-
-            if results["metadatas"]:
-                for metadata in results["metadatas"][0]:
-                    path = metadata["path"]
-                    if path in seen_paths:
-                        continue
-
-                    # Apply category filter if specified
-                    if category and metadata.get("category") != category:
-                        continue
-
-                    seen_paths.add(path)
-                    sections.append(
-                        Section(
-                            title=metadata.get("title", "Untitled"),
-                            path=path,
-                            category=metadata.get("category", "other"),
-                            subcategory=metadata.get("subcategory") or None,
-                            use_cases=self._get_use_cases(metadata.get("category", "other")),
-                            child_count=0,
-                        )
-                    )
+            # Deduplicate by path, keeping rank order (chunks of a page share metadata)
+            candidates = list({m["path"]: m for m in metadatas[0]}.values())
 
-                    if len(sections) >= limit:
-                        break
+            # Convert only the sections that are returned
+            sections = [self._search_section(metadata) for metadata in candidates[:limit]]
 
-            return SectionList(
-                sections=sections,
-                total_count=len(sections),
-                categories=self.sections_index.get("categories", []),
-            )
+            return {
+                "sections": sections,
+                "total_count": len(sections),
+                "categories": self.sections_index.get("categories", []),
+            }
         else:
             # Use pre-computed index
-            all_sections = self.sections_index.get("sections", [])
-
             if category:
-                all_sections = [s for s in all_sections if s.get("category") == category]
-
-            sections = [Section(**s) for s in all_sections[:limit]]
+                all_sections = self._sections_by_category.get(category, [])
+            else:
+                all_sections = self._sections
 
-            return SectionList(
-                sections=sections,
-                total_count=len(all_sections),
-                categories=self.sections_index.get("categories", []),
-            )
+            return {
+                "sections": all_sections[:limit],
+                "total_count": len(all_sections),
+                "categories": self.sections_index.get("categories", []),
+            }
 
-    def get_documentation(
+    async def get_documentation(
         self,
         path: str,
         include_related: bool = False,
-    ) -> DocumentationContent | None:
+    ) -> DocumentationContentDict | None:
         """Retrieve full documentation for a path.
 
         Fetches all chunks for the path and reassembles them.
         """
-        if not self.collection:
-            return None
-
-        # Query all chunks for this path
-        results = self.collection.get(
-            where={"path": path},
-            include=["documents", "metadatas"],
-        )
+        results = await self.get_documentation_many([path], include_related=include_related)
+        return results[0] if results else None
 
-        if not results["ids"]:
-            return None
+    async def get_documentation_many(
+        self,
+        paths: list[str],
+        include_related: bool = False,
+    ) -> list[DocumentationContentDict]:
+        """Retrieve full documentation for several paths, in request order.
 
-        # Sort chunks by index and reassemble
-        chunks = sorted(
-            zip(results["documents"], results["metadatas"]),
-            key=lambda x: x[1].get("chunk_index", 0),
-        )
+        Fetches the chunks of all paths in one query and reassembles them
+        per path. Paths without any chunks are skipped.
+        """
+        if not paths or not await self._has_store():
+            return []
 
-        full_content = "\n\n".join(doc for doc, _ in chunks)
-        first_metadata = chunks[0][1]
+        # Query all chunks for these paths
+        documents, metadatas = await self._fetch_chunks(list(set(paths)))
 
-        # Parse breadcrumb from JSON string
-        breadcrumb = []
-        breadcrumb_str = first_metadata.get("breadcrumb", "[]")
-        if breadcrumb_str:
-            try:
-                breadcrumb = json.loads(breadcrumb_str)
-            except json.JSONDecodeError:
-                pass
+        # Group result rows by path
+        rows_by_path: dict[str, list[int]] = defaultdict(list)
+        for i, metadata in enumerate(metadatas):
+            rows_by_path[metadata["path"]].append(i)
 
-        related_paths: list[str] = []
+        related: dict[str, list[str]] = {}
         if include_related:
-            related_paths = self._find_related(path, limit=5)
-
-        return DocumentationContent(
-            path=path,
-            title=first_metadata.get("title", "Untitled"),
-            content=full_content,
-            breadcrumb=breadcrumb,
-            related_paths=related_paths,
-        )
+            related = await self._find_related_many(list(rows_by_path), limit=5)
+
+        contents: list[DocumentationContentDict] = []
+        for path in paths:
+            rows = rows_by_path.get(path)
+            if not rows:
+                continue
+
+            # Order chunks by index with a stable argsort and reassemble
+            chunk_indices = np.fromiter(
+                (metadatas[i].get("chunk_index", 0) for i in rows),
+                dtype=np.int32,
+                count=len(rows),
+            )
+            order = [rows[j] for j in np.argsort(chunk_indices, kind="stable")]
+
+            full_content = "\n\n".join(documents[i] for i in order)
+            first_metadata = metadatas[order[0]]
+
+            breadcrumb = self._breadcrumb_map.get(path)
+            if breadcrumb is None:
+                # Not in the crawler's index; parse the JSON string stored with the chunk
+                breadcrumb = []
+                breadcrumb_str = first_metadata.get("breadcrumb", "[]")
+                if breadcrumb_str:
+                    try:
+                        breadcrumb = orjson.loads(breadcrumb_str)
+                    except orjson.JSONDecodeError:
+                        pass
+
+            contents.append(
+                {
+                    "path": path,
+                    "title": first_metadata.get("title", "Untitled"),
+                    "content": full_content,
+                    "breadcrumb": breadcrumb,
+                    "related_paths": related.get(path, []),
+                }
+            )
 
-    def _find_related(self, path: str, limit: int = 5) -> list[str]:
-        """Find related documentation paths using embedding similarity."""
-        if not self.collection:
-            return []
+        return contents
 
-        # Get first chunk for current document
-        doc_results = self.collection.get(
-            where={"path": path, "chunk_index": 0},
-            include=["embeddings"],
-        )
+    async def _find_related(self, path: str, limit: int = 5) -> list[str]:
+        """Find related documentation paths using embedding similarity."""
+        related = await self._find_related_many([path], limit=limit)
+        return related.get(path, [])
 
-        if not doc_results["embeddings"]:
-            return []
+    async def _find_related_many(self, paths: list[str], limit: int = 5) -> dict[str, list[str]]:
+        """Find related paths for several documents.
 
-        # Find similar documents
-        similar = self.collection.query(
-            query_embeddings=doc_results["embeddings"],
-            n_results=limit + 10,  # Get extra to deduplicate
-            include=["metadatas"],
-        )
+        Paths are served from the precomputed related index when it holds
+        enough entries; the rest share one similarity query, cached per
+        (path, limit).
+        """
+        if not await self._has_store():
+            return {}
+
+        related: dict[str, list[str]] = {}
+        missing: list[str] = []
+        for path in paths:
+            key = (path, limit)
+            precomputed = self._related_map.get(path, [])
+            if len(precomputed) >= limit:
+                related[path] = precomputed[:limit]
+            elif key in self._related_cache:
+                self._related_cache.move_to_end(key)
+                related[path] = list(self._related_cache[key])
+            else:
+                missing.append(path)
+
+        if not missing:
+            return related
+
+        embeddings = await self._first_chunk_embeddings(missing)
+        queried = [path for path in missing if path in embeddings]
+
+        found: dict[str, tuple[str, ...]] = {}
+        if queried:
+            # Find similar documents
+            metadatas, result_embeddings = await self._similar_chunks(
+                [embeddings[path] for path in queried],
+                # The crawler's candidate pool, so results match its related index
+                # (prefixes of it); only limits above its size fetch more
+                n_results=max(RELATED_CANDIDATES, limit + 10),
+                # Candidate embeddings are only needed for MMR re-ranking
+                include_embeddings=settings.related_mmr_lambda < 1.0,
+            )
 
-        # Deduplicate and return paths (excluding self)
-        seen: set[str] = {path}
-        related = []
+            for i, path in enumerate(queried):
+                found[path] = tuple(
+                    rank_related(
+                        path,
+                        embeddings[path],
+                        metadatas[i],
+                        result_embeddings[i] if result_embeddings is not None else None,
+                        limit=limit,
+                        lambda_mult=settings.related_mmr_lambda,
+                    )
+                )
 
-        if similar["metadatas"]:
-            for metadata in similar["metadatas"][0]:
-                result_path = metadata["path"]
-                if result_path not in seen:
-                    seen.add(result_path)
-                    related.append(result_path)
-                    if len(related) >= limit:
-                        break
+        for path in missing:
+            result = found.get(path, ())
+            self._related_cache[(path, limit)] = result
+            if len(self._related_cache) > self.RELATED_CACHE_SIZE:
+                self._related_cache.popitem(last=False)
+            related[path] = list(result)
 
         return related
 
+    async def _first_chunk_embeddings(self, paths: list[str]) -> dict[str, np.ndarray]:
+        """Return the embeddings of documents' first chunks.
+
+        Looks in the crawler's embeddings index, then the per-path cache, and
+        fetches only the remaining ones from the store.
+        """
+        embeddings: dict[str, np.ndarray] = {}
+        missing: list[str] = []
+        for path in paths:
+            embedding = self._path_to_vec.get(path)
+            if embedding is None:
+                embedding = self._emb_cache.get(path)
+            if embedding is None:
+                missing.append(path)
+            else:
+                embeddings[path] = embedding
+
+        if missing:
+            fetched = await self._fetch_first_chunk_embeddings(missing)
+            for path, embedding in fetched.items():
+                self._emb_cache[path] = embeddings[path] = embedding
+
+        return embeddings
+
+    def _search_section(self, metadata: dict) -> SectionDict:
+        """Build a section from a search result's chunk metadata."""
+        category = metadata.get("category", "other")
+        return {
+            "title": metadata.get("title", "Untitled"),
+            "path": metadata["path"],
+            "use_cases": self._get_use_cases(category),
+            "category": category,
+            "subcategory": metadata.get("subcategory") or None,
+            "child_count": 0,
+        }
+
     def _get_use_cases(self, category: str) -> list[str]:
         """Return common use cases for a category."""
-        use_case_map = {
-            "compute": ["Create and manage clusters", "Configure autoscaling", "Use serverless compute"],
-            "delta": ["Create Delta tables", "Optimize table performance", "Use time travel"],
-            "admin": ["Manage workspaces", "Configure users and groups", "Set up SSO"],
-            "data-governance": ["Set up Unity Catalog", "Configure access control", "Track data lineage"],
-            "dev-tools": ["Use Databricks CLI", "Configure asset bundles", "API authentication"],
-            "connect": ["Connect to storage", "Set up streaming", "External integrations"],
-            "sql": ["Write SQL queries", "Use SQL functions", "Query optimization"],
-            "machine-learning": ["Train ML models", "Track experiments", "Deploy models"],
-            "generative-ai": ["Use AI features", "Build AI applications", "LLM integration"],
-            "workflows": ["Create jobs", "Schedule workflows", "Monitor runs"],
-            "notebooks": ["Create notebooks", "Use magic commands", "Visualize data"],
-            "dashboards": ["Create dashboards", "Build visualizations", "Share insights"],
-        }
-        return use_case_map.get(category, ["General documentation"])
+        return list(_USE_CASE_MAP.get(category, _DEFAULT_USE_CASES))
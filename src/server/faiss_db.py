@@ -0,0 +1,150 @@
+"""FAISS and Parquet query interface for MCP server."""
+
+import asyncio
+import logging
+from pathlib import Path
+
+import faiss
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..shared.config import settings
+from .db import DocumentDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class FaissDocumentDatabase(DocumentDatabase):
+    """Query interface over the FAISS index and Parquet chunk table the crawler exports.
+
+    A read-only alternative to Chroma: chunk vectors are searched with FAISS,
+    and row i of the chunk table holds the payload of vector i. Rows are
+    sorted by path and chunk index, so each page is one contiguous run.
+    """
+
+    def __init__(
+        self,
+        faiss_index_path: Path = settings.faiss_index_path,
+        documents_path: Path = settings.documents_path,
+        sections_index_path: Path = settings.sections_index_path,
+        related_index_path: Path = settings.related_index_path,
+        embeddings_index_path: Path = settings.embeddings_index_path,
+        breadcrumbs_index_path: Path = settings.breadcrumbs_index_path,
+    ):
+        self._init_common(
+            sections_index_path,
+            related_index_path,
+            embeddings_index_path,
+            breadcrumbs_index_path,
+        )
+
+        self.index: faiss.Index | None = None
+        self.table: pa.Table | None = None
+        self._metadata: pa.Table | None = None  # table without the id and document columns
+        self._path_rows: dict[str, tuple[int, int]] = {}  # path -> (start, stop) rows
+        self._category_selectors: dict[str, faiss.IDSelector] = {}
+
+        faiss_index_path, documents_path = Path(faiss_index_path), Path(documents_path)
+        if faiss_index_path.exists() and documents_path.exists():
+            self._load_store(faiss_index_path, documents_path)
+        else:
+            # The crawler only exports these when it runs with the faiss backend
+            logger.warning(
+                "FAISS index %s or chunk table %s not found; queries return no results. "
+                "Run the crawler with DATABRICKS_DOCS_VECTOR_BACKEND=faiss to export them.",
+                faiss_index_path,
+                documents_path,
+            )
+
+    def _load_store(self, faiss_index_path: Path, documents_path: Path) -> None:
+        """Load the FAISS index and chunk table, and index their rows by path and category."""
+        self.index = faiss.read_index(str(faiss_index_path))
+        self.table = pq.read_table(documents_path, memory_map=True)
+
+        # Rows of these columns are shaped like the chunk metadata Chroma returns
+        self._metadata = self.table.drop_columns(["id", "document"])
+
+        paths = self.table["path"].to_numpy(zero_copy_only=False)
+        unique_paths, starts, counts = np.unique(paths, return_index=True, return_counts=True)
+        self._path_rows = {
+            path: (start, start + count)
+            for path, start, count in zip(unique_paths.tolist(), starts.tolist(), counts.tolist())
+        }
+
+        # Category filters run inside FAISS, restricting the search to these rows
+        categories = self.table["category"].to_numpy(zero_copy_only=False)
+        for category in np.unique(categories).tolist():
+            rows = np.flatnonzero(categories == category).astype(np.int64)
+            self._category_selectors[category] = faiss.IDSelectorBatch(rows)
+
+    async def _has_store(self) -> bool:
+        """Return whether an exported, non-empty FAISS index is loaded."""
+        return self.index is not None and self.index.ntotal > 0
+
+    async def _similar_chunks(
+        self,
+        query_embeddings: list,
+        n_results: int,
+        category: str | None = None,
+        include_embeddings: bool = False,
+    ) -> tuple[list[list[dict]], list | None]:
+        """Find the chunks nearest to each query embedding."""
+        # FAISS releases the GIL while searching
+        return await asyncio.to_thread(
+            self._search, query_embeddings, n_results, category, include_embeddings
+        )
+
+    def _search(
+        self,
+        query_embeddings: list,
+        n_results: int,
+        category: str | None,
+        include_embeddings: bool,
+    ) -> tuple[list[list[dict]], list | None]:
+        """Run a FAISS search and look up the hits' metadata rows."""
+        params = None
+        if category:
+            selector = self._category_selectors.get(category)
+            if selector is None:
+                # No chunks in this category
+                return [[] for _ in query_embeddings], None
+            params = faiss.SearchParameters(sel=selector)
+
+        queries = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        _, labels = self.index.search(queries, min(n_results, self.index.ntotal), params=params)
+
+        metadatas: list[list[dict]] = []
+        embeddings: list[np.ndarray] = []
+        for row_labels in labels:
+            # Unfilled result slots are -1
+            rows = row_labels[row_labels >= 0]
+            metadatas.append(self._metadata.take(rows).to_pylist())
+            if include_embeddings:
+                embeddings.append(self.index.reconstruct_batch(rows))
+
+        return metadatas, embeddings if include_embeddings else None
+
+    async def _fetch_chunks(self, paths: list[str]) -> tuple[list[str], list[dict]]:
+        """Return the documents and metadatas of every chunk of the given paths."""
+        rows = [
+            row
+            for path in paths
+            if path in self._path_rows
+            for row in range(*self._path_rows[path])
+        ]
+        if not rows:
+            return [], []
+
+        chunks = self.table.take(rows)
+        return chunks["document"].to_pylist(), chunks.drop_columns(["id", "document"]).to_pylist()
+
+    async def _fetch_first_chunk_embeddings(self, paths: list[str]) -> dict[str, np.ndarray]:
+        """Read the vectors of documents' first chunks back from the FAISS index."""
+        found = [path for path in paths if path in self._path_rows]
+        if not found:
+            return {}
+
+        # A page's run starts with its first chunk
+        rows = np.array([self._path_rows[path][0] for path in found], dtype=np.int64)
+        return dict(zip(found, self.index.reconstruct_batch(rows)))
@@ -12,10 +12,27 @@ mcp = FastMCP(
 )
 
 # Initialize database connection
-db = DocumentDatabase(
-    persist_directory=settings.chroma_path,
-    sections_index_path=settings.sections_index_path,
-)
+if settings.vector_backend == "faiss":
+    # Optional "faiss" extra
+    from .faiss_db import FaissDocumentDatabase
+
+    db = FaissDocumentDatabase(
+        faiss_index_path=settings.faiss_index_path,
+        documents_path=settings.documents_path,
+        sections_index_path=settings.sections_index_path,
+        related_index_path=settings.related_index_path,
+        embeddings_index_path=settings.embeddings_index_path,
+        breadcrumbs_index_path=settings.breadcrumbs_index_path,
+    )
+else:
+    db = DocumentDatabase(
+        persist_directory=settings.chroma_path,
+        sections_index_path=settings.sections_index_path,
+        related_index_path=settings.related_index_path,
+        embeddings_index_path=settings.embeddings_index_path,
+        breadcrumbs_index_path=settings.breadcrumbs_index_path,
+        chroma_http_url=settings.chroma_http_url,
+    )
 
 # Register tools
 register_tools(mcp, db)
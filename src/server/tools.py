@@ -2,7 +2,7 @@
 
 from mcp.server.fastmcp import FastMCP
 
-from ..shared.models import DocumentationContent, SectionList
+from ..shared.models import DocumentationContentDict, SectionListDict
 from .db import DocumentDatabase
 
 
@@ -10,11 +10,11 @@ def register_tools(mcp: FastMCP, db: DocumentDatabase) -> None:
     """Register all MCP tools with the server."""
 
     @mcp.tool()
-    def list_sections(
+    async def list_sections(
         category: str | None = None,
         search_query: str | None = None,
         limit: int = 50,
-    ) -> dict:
+    ) -> SectionListDict:
         """List available documentation sections with their titles, use cases, and paths.
 
         Use this tool to discover what documentation is available before retrieving
@@ -42,18 +42,17 @@ def register_tools(mcp: FastMCP, db: DocumentDatabase) -> None:
             - notebooks: Notebooks and visualizations
             - dashboards: Dashboards and BI
         """
-        result = db.list_sections(
+        return await db.list_sections(
             category=category,
             search_query=search_query,
             limit=limit,
         )
-        return result.model_dump()
 
     @mcp.tool()
-    def get_documentation(
+    async def get_documentation(
         paths: list[str],
         include_related: bool = False,
-    ) -> list[dict]:
+    ) -> list[DocumentationContentDict]:
         """Retrieve full documentation content for specified sections.
 
         Use this tool after list_sections to get detailed documentation.
@@ -72,9 +71,4 @@ def register_tools(mcp: FastMCP, db: DocumentDatabase) -> None:
             - Request multiple paths at once to reduce round trips
             - Content is returned in markdown format
         """
-        results = []
-        for path in paths:
-            content = db.get_documentation(path, include_related=include_related)
-            if content:
-                results.append(content.model_dump())
-        return results
+        return await db.get_documentation_many(paths, include_related=include_related)
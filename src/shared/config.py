@@ -12,16 +12,35 @@ class Settings(BaseSettings):
     data_dir: Path = Path("./data")
     chroma_path: Path = Path("./data/chroma")
     sections_index_path: Path = Path("./data/sections_index.json")
+    related_index_path: Path = Path("./data/related_index.json")
+    embeddings_index_path: Path = Path("./data/embeddings_index.npz")
+    breadcrumbs_index_path: Path = Path("./data/breadcrumbs_index.json")
     crawl_state_path: Path = Path("./data/crawl_state.json")
+    faiss_index_path: Path = Path("./data/faiss.index")
+    documents_path: Path = Path("./data/documents.parquet")
+
+    # Chroma server for MCP queries (e.g. http://localhost:8000); unset uses chroma_path
+    chroma_http_url: str | None = None
+
+    # Vector store the MCP server reads: "chroma", or "faiss" for the FAISS index
+    # and Parquet chunk table the crawler exports (needs the "faiss" extra)
+    vector_backend: str = "chroma"
 
     # Crawler settings
     rate_limit: float = 1.0  # requests per second
     max_concurrent: int = 5
     max_chunk_tokens: int = 1000
     chunk_overlap_tokens: int = 100
+    upsert_batch_size: int = 256  # chunks buffered per ChromaDB write
 
     # Embedding model
     embedding_model: str = "all-MiniLM-L6-v2"
+    embedding_batch_size: int = 64
+    embedding_backend: str = "torch"  # "onnx" encodes server queries with ONNX Runtime
+    embedding_onnx_file: str = "onnx/model_qint8_avx512_vnni.onnx"  # int8-quantized export
+
+    # Related pages: 1.0 ranks by similarity only, lower values favor diversity (MMR)
+    related_mmr_lambda: float = 1.0
 
     # Documentation source
     base_url: str = "https://docs.databricks.com"
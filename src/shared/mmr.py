@@ -0,0 +1,78 @@
+"""Maximal marginal relevance re-ranking for related pages."""
+
+import numpy as np
+
+# Related paths precomputed per page by the crawler
+RELATED_INDEX_SIZE = 10
+
+# Chunks fetched per related-pages query (extra to deduplicate). MMR re-ranks
+# within this pool, so the crawler's related index and the server's live
+# lookups must use the same size.
+RELATED_CANDIDATES = RELATED_INDEX_SIZE + 10
+
+
+def mmr(query: np.ndarray, candidates: np.ndarray, lambda_mult: float, k: int) -> list[int]:
+    """Select up to k candidate rows by maximal marginal relevance.
+
+    Each pick maximizes lambda_mult * similarity to the query minus
+    (1 - lambda_mult) * the highest similarity to an already picked row.
+    Returns row indices in pick order.
+    """
+    k = min(k, len(candidates))
+    if k == 0:
+        return []
+
+    candidates = _normalize(np.asarray(candidates, dtype=np.float32))
+    query = _normalize(np.asarray(query, dtype=np.float32))
+
+    relevance = candidates @ query
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    picked = np.zeros(len(candidates), dtype=bool)
+
+    selected: list[int] = []
+    index = int(np.argmax(relevance))
+    while True:
+        selected.append(index)
+        picked[index] = True
+        if len(selected) == k:
+            return selected
+
+        # Only the newest pick can raise a candidate's redundancy
+        redundancy = np.maximum(redundancy, candidates @ candidates[index])
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[picked] = -np.inf
+        index = int(np.argmax(scores))
+
+
+def rank_related(
+    path: str,
+    embedding: np.ndarray,
+    metadatas: list[dict],
+    embeddings: np.ndarray | None,
+    limit: int,
+    lambda_mult: float,
+) -> list[str]:
+    """Pick related paths from a similarity query's chunk results.
+
+    Chunks are deduplicated to each page's best match and `path` itself is
+    dropped. With lambda_mult < 1 the pages are re-ranked by MMR, otherwise
+    they keep the query's similarity order.
+    """
+    # Results are ranked, so the first chunk seen for a page is its best match
+    first_rows: dict[str, int] = {}
+    for row, metadata in enumerate(metadatas):
+        first_rows.setdefault(metadata["path"], row)
+    first_rows.pop(path, None)
+
+    paths = list(first_rows)
+    if lambda_mult >= 1.0 or embeddings is None:
+        return paths[:limit]
+
+    rows = np.asarray(embeddings)[list(first_rows.values())]
+    return [paths[i] for i in mmr(embedding, rows, lambda_mult, limit)]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors (along the last axis) to unit length."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
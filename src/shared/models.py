@@ -1,10 +1,12 @@
-"""Pydantic models for Databricks documentation data."""
+"""Data models for Databricks documentation data."""
 
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from typing import Optional
 
 from pydantic import BaseModel, Field
+from typing_extensions import TypedDict  # pydantic needs this TypedDict before Python 3.12
 
 
 class DocumentCategory(str, Enum):
@@ -51,17 +53,20 @@ class DocumentMetadata(BaseModel):
     content_hash: str = Field(default="", description="Hash of content for change detection")
 
 
-class DocumentChunk(BaseModel):
-    """A chunk of documentation content."""
+@dataclass(slots=True)
+class DocumentChunk:
+    """A chunk of documentation content.
 
-    id: str = Field(description="Unique chunk ID (url_hash + chunk_index)")
-    document_id: str = Field(description="Parent document URL hash")
-    content: str = Field(description="Chunk text content (markdown)")
-    chunk_index: int = Field(description="Position in document (0-indexed)")
-    heading_context: list[str] = Field(
-        default_factory=list, description="Heading hierarchy for context"
-    )
+    A plain dataclass: chunks are built in bulk by the crawler and never
+    leave the process, so they skip pydantic validation.
+    """
+
+    id: str  # Unique chunk ID (url_hash + chunk_index)
+    document_id: str  # Parent document URL hash
+    content: str  # Chunk text content (markdown)
+    chunk_index: int  # Position in document (0-indexed)
     metadata: DocumentMetadata
+    heading_context: list[str] = field(default_factory=list)  # Heading hierarchy for context
 
 
 class Section(BaseModel):
@@ -91,3 +96,34 @@ class DocumentationContent(BaseModel):
     content: str = Field(description="Full markdown content")
     breadcrumb: list[str]
     related_paths: list[str] = Field(default_factory=list)
+
+
+# Plain-dict shapes of the response models. The server builds these directly
+# so responses skip model construction; pydantic models still validate input.
+class SectionDict(TypedDict):
+    """Section as returned by the list-sections tool."""
+
+    title: str
+    path: str
+    use_cases: list[str]
+    category: str
+    subcategory: str | None
+    child_count: int
+
+
+class SectionListDict(TypedDict):
+    """Response of the list-sections tool."""
+
+    sections: list[SectionDict]
+    total_count: int
+    categories: list[str]
+
+
+class DocumentationContentDict(TypedDict):
+    """Response item of the get-documentation tool."""
+
+    path: str
+    title: str
+    content: str  # Full markdown content
+    breadcrumb: list[str]
+    related_paths: list[str]